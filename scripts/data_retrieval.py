@@ -1,15 +1,56 @@
 import os
+import csv
+from io import StringIO
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 
 import yaml
 import sqlalchemy
 import numpy as np
 import pandas as pd
 
+try:
+    from yaml import CSafeLoader as SafeLoader  # libyaml C parser
+except ImportError:
+    from yaml import SafeLoader
+
 _DEFAULT_QUERY = \
     """
-    SELECT *
-    FROM {}
-    WHERE "eventName" = 'Shot';
+    SELECT {columns}
+    FROM {table}
+    WHERE "eventName" = 'Shot'
+    """
+
+# only the columns used by the features and the modeling are fetched
+_DEFAULT_COLUMNS = ['id', 'matchId', 'matchPeriod', 'eventSec', 'teamId', 'playerId', 'eventName',
+                    'subEventName', 'x1', 'y1', '101', '401', '402', '403']  # TAG: numbers
+
+# ids fit in int32 and coordinates are percentages, eventSec stays float64 as it is a join key
+_READ_DTYPES = {'matchId': np.int32, 'teamId': np.int32, 'playerId': np.int32,
+                'x1': np.float32, 'y1': np.float32}
+
+_COLUMNS_QUERY = \
+    """
+    SELECT table_name, column_name, data_type
+    FROM information_schema.columns
+    WHERE table_schema = 'public' AND left(table_name, 7) = 'events_'
+    ORDER BY table_name, ordinal_position;
+    """
+
+# table statistics are kept up to date by the server so no table has to be scanned
+_TABLE_VERSIONS_QUERY = \
+    """
+    SELECT relid, relname, n_tup_ins, n_tup_upd, n_tup_del
+    FROM pg_stat_user_tables
+    WHERE schemaname = 'public' AND (left(relname, 7) = 'events_' OR relname = 'players')
+    ORDER BY relname;
+    """
+
+_TABLES_QUERY = \
+    """
+    SELECT table_name
+    FROM information_schema.tables
+    WHERE table_schema = 'public';
     """
 
 
@@ -19,42 +60,100 @@ def get_data() -> pd.DataFrame:
     :return: data frame of data and engineered features
     """
     sql_engine = get_engine()
-    data_df = assemble_df(sql_engine)
-    # Clean data
-    data_df.replace([None], False, inplace=True)
-
-    # Spatial Engineered Features:
-    data_df['distance_to_goal_mid'] = calc_distance_to_mid(data_df['x1'], data_df['y1'])
-    data_df['distance_to_goal_nearest'] = calc_distance_to_nearest(data_df['x1'], data_df['y1'])
-    data_df['angular_size_rad_goal'] = calc_angular_size_radians(data_df)
-    data_df['projected_size_yds_goal'] = calc_projected_size_yds(data_df['angular_size_rad_goal'],
-                                                                 data_df[
-                                                                     'distance_to_goal_nearest'],
-                                                                 data_df['y1'])
+    data_df = assemble_df(sql_engine)  # the tag columns come back as clean booleans
+    for column, dtype in _READ_DTYPES.items():
+        data_df[column] = data_df[column].astype(dtype)
+
+    # Spatial Engineered Features: computed in float32 straight from the downcast coordinates
+    xs = data_df['x1'].to_numpy()
+    ys = data_df['y1'].to_numpy()
+    mask_right = ys > 52
+    mask_left = ys < 48
+
+    # set column by column, assign() would copy the whole frame
+    for feature, values in calc_spatial_features(xs, ys).items():
+        data_df[feature] = values
     data_df['kicked'] = get_kicked(data_df)
-    data_df['side_of_field_matching_foot'] = compare_foot_to_side_of_field(data_df)
+    data_df['side_of_field_matching_foot'] = compare_foot_to_side_of_field(data_df, mask_right,
+                                                                           mask_left)
+
+    # The remaining features each need their own query, the queries are independent so they are
+    # run at the same time, each on its own connection from the engine's pool
+    leagues = data_df['league'].unique()
+
+    def query_feature(feature_func, *args) -> pd.Series:
+        """
+        runs one of the feature functions that query the database on a pooled connection
+        :param feature_func: function taking the shots data frame and a connection
+        :param args: any extra arguments for the function
+        :return: the feature
+        """
+        with sql_engine.connect() as cxn:
+            return feature_func(data_df, cxn, *args)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        # Temporal Engineered Features:
+        send_off_diff = executor.submit(query_feature, get_send_off_diff, leagues)
+        free_kick_30s_ago = executor.submit(query_feature, get_free_kick_data, leagues)
+
+        # Cross Referenced Data
+        dominant_foot = executor.submit(query_feature, get_dominant_foot)
+
+    data_df['send_off_diff'] = send_off_diff.result()
+    data_df['free_kick_30s_ago'] = free_kick_30s_ago.result()
+    data_df['dominant_foot'] = dominant_foot.result()
+
+    return data_df
+
+
+def get_cached_data(cache_path: str = None, invalidate: bool = False,
+                    cache_key: str = None) -> pd.DataFrame:
+    """
+    get_data with the result cached on disk, the cache is rebuilt if the sql credentials or this
+    script have changed since it was written, if the tables in the data base have been added to,
+    changed or reloaded (e.g. another league was loaded) or if the cache key is different
+    :param cache_path: location of the cache file, if not provided data/shots_features.pkl is used
+    :param invalidate: rebuild the cache even if it is up to date
+    :param cache_key: any extra key the cache has to match, e.g. to keep caches of separate runs
+    :return: data frame of data and engineered features
+    """
+    if cache_path is None:
+        cache_path = get_cache_location()
 
-    # Temporal Engineered Features:
-    data_df['send_off_diff'] = get_send_off_diff(data_df, sql_engine)
-    data_df['free_kick_30s_ago'] = get_free_kick_data(data_df, sql_engine)
+    # the cache is only valid for the data it was built from
+    data_version = (get_table_versions(get_engine()), cache_key)
 
-    # Cross Referenced Data
-    data_df['dominant_foot'] = get_dominant_foot(data_df, sql_engine)
+    if not invalidate and os.path.exists(cache_path):
+        cache_time = os.path.getmtime(cache_path)
+        source_time = max(os.path.getmtime(get_sql_cred_location()), os.path.getmtime(__file__))
+        if cache_time > source_time:
+            cached_version, data_df = pd.read_pickle(cache_path)
+            if cached_version == data_version:
+                return data_df
+
+    # the tables may have changed since their columns were cached
+    get_table_columns.cache_clear()
+    # pickle keeps the downcast dtypes and the index exactly as get_data returns them
+    data_df = get_data()
+    pd.to_pickle((data_version, data_df), cache_path)
 
     return data_df
 
 
+@lru_cache(maxsize=1)
 def get_engine() -> sqlalchemy.engine.Engine:
     """
-    creates a sqlalchemy engine
+    creates a sqlalchemy engine, the engine is cached so repeated calls share its connection pool
     :return: a sqlalchemy engine
     """
     db_string = get_db_location()
-    engine = sqlalchemy.create_engine(db_string)
+    # the engine lives for the whole session so check connections are still alive before use
+    engine = sqlalchemy.create_engine(db_string, pool_pre_ping=True)
 
     return engine
 
 
+@lru_cache(maxsize=1)
 def get_db_location() -> str:
     """
     Opens the sql_cred.yml helper file to get the location of the db and returns the location as
@@ -63,11 +162,12 @@ def get_db_location() -> str:
     """
     sql_cred_loc = get_sql_cred_location()
     with open(sql_cred_loc) as file_stream:
-        sql_dict = yaml.safe_load(file_stream)
+        sql_dict = yaml.load(file_stream, Loader=SafeLoader)
 
     return sql_dict['sql_url']
 
 
+@lru_cache(maxsize=1)
 def get_sql_cred_location() -> str:
     """
     Gets the absolute path to the helper file
@@ -79,28 +179,106 @@ def get_sql_cred_location() -> str:
     return os.path.join(root_folder, 'keys/sql_cred.yml')
 
 
-def assemble_df(engine: sqlalchemy.engine.Engine, query: str = None) -> pd.DataFrame:
+def get_cache_location() -> str:
+    """
+    Gets the absolute path to the cached shots and features
+    :return: absolute path to the cache file
+    """
+    filename = os.path.abspath(__file__)
+    root_folder = filename[:filename.find('/scripts/')]
+
+    return os.path.join(root_folder, 'data/shots_features.pkl')
+
+
+def assemble_df(engine: sqlalchemy.engine.Engine, query: str = None,
+                columns: list = None) -> pd.DataFrame:
     """
-    queries every table in the data base with the same query
+    queries every events table in the data base with the same query. The queries are combined
+    with UNION ALL so that all the tables are fetched in a single round trip
     :param engine: sqlalchemy engine for the connection
-    :param query: sql query sting. if None the default one will be used
+    :param query: sql query sting with {columns} and {table} fields. if None the default one will
+                  be used
+    :param columns: columns to select. if None the default ones will be used
     :return: the results of the queries concatenated into 1 data frame
     """
     if not query:
         query = _DEFAULT_QUERY
+    if not columns:
+        columns = _DEFAULT_COLUMNS
+
+    table_columns = get_table_columns(engine)
+
+    # the tag columns differ from league to league so every table needs to select the same columns
+    # in the same order for the UNION ALL to line up, missing columns are filled with NULL
+    column_types = {}
+    for types in table_columns.values():
+        column_types.update(types)
+    missing_columns = [column for column in columns
+                       if not column.isdigit() and column not in column_types]
+    if missing_columns:
+        raise ValueError(f'columns {missing_columns} are not in any of the tables searched: '
+                         f'{sorted(table_columns)}')
+
+    sql_queries = []
+    for table, types in table_columns.items():
+        select_list = []
+        for column in columns:
+            if column.isdigit():  # tags are only stored when True, so NULL or missing is False
+                value = f'COALESCE("{column}", false)' if column in types else 'false'
+                select_list.append(f'{value} AS "{column}"')
+            elif column in types:
+                select_list.append(f'"{column}"')
+            else:
+                select_list.append(f'CAST(NULL AS {column_types[column]}) AS "{column}"')
+        select_list.append(f"'{table[7:]}' AS league")
+        sql_queries.append(query.format(columns=', '.join(select_list), table=table))
+
+    data_df = query_db(engine, '\nUNION ALL\n'.join(sql_queries))
+    # PostgreSQL already returns the tags as booleans, other data bases may return 0/1
+    for column in columns:
+        if column.isdigit() and data_df[column].dtype != bool:
+            data_df[column] = data_df[column].astype(bool)
 
-    tables = engine.table_names()
-    data_dfs = []
+    return data_df
 
-    for table in tables:
-        if table.startswith('events_'):
-            sql_query = query.format(table)
-            response_df = query_db(engine, sql_query)
-            response_df['league'] = table[7:]
-            data_dfs.append(response_df)
 
-    data_df = pd.concat(data_dfs)
-    return data_df
+def get_table_names(engine: sqlalchemy.engine.Engine) -> list:
+    """
+    Looks up the tables in the data base, not cached as the loading scripts create tables
+    :param engine: sqlalchemy engine for the connection
+    :return: list of table names
+    """
+    return query_db(engine, _TABLES_QUERY)['table_name'].tolist()
+
+
+def get_table_versions(engine: sqlalchemy.engine.Engine) -> tuple:
+    """
+    Gets a cheap version of the events tables and the players table from the statistics
+    PostgreSQL keeps, a table that is reloaded gets a new id and any insert, update or delete
+    changes its counts
+    :param engine: sqlalchemy engine for the connection
+    :return: tuple of (table id, table name, inserts, updates, deletes) for each table
+    """
+    versions_df = query_db(engine, _TABLE_VERSIONS_QUERY)
+
+    return tuple(versions_df.itertuples(index=False, name=None))
+
+
+@lru_cache(maxsize=None)
+def get_table_columns(engine: sqlalchemy.engine.Engine) -> dict:
+    """
+    Looks up the columns of every events table in the data base, the schema doesn't change while
+    the features are being built so the result is cached per engine
+    :param engine: sqlalchemy engine for the connection
+    :return: dictionary of table name to a dictionary of column name to data type
+    """
+    columns_df = query_db(engine, _COLUMNS_QUERY)
+
+    table_columns = {}
+    for table, column, data_type in columns_df.itertuples(index=False):
+        table_columns.setdefault(table, {})[column] = data_type
+
+    return table_columns
 
 
 def query_db(engine: sqlalchemy.engine.Engine, query: str = None) -> pd.DataFrame:
@@ -111,7 +289,7 @@ def query_db(engine: sqlalchemy.engine.Engine, query: str = None) -> pd.DataFram
     :return: resulting data frame from the query
     """
     if not query:
-        query = _DEFAULT_QUERY.format('England')
+        query = _DEFAULT_QUERY.format(columns='*', table='events_england')
 
     with engine.connect() as cxn:
         data = pd.read_sql(query, cxn)
@@ -119,7 +297,49 @@ def query_db(engine: sqlalchemy.engine.Engine, query: str = None) -> pd.DataFram
     return data
 
 
-def calc_distance_to_mid(xs: pd.Series, ys: pd.Series) -> pd.Series:
+def psql_insert_copy(table, cxn, keys, data_iter):
+    """
+    insertion method for pandas.DataFrame.to_sql that bulk loads the rows with PostgreSQL's
+    COPY FROM STDIN, this skips parsing an INSERT statement per row
+    :param table: pandas SQLTable being written to
+    :param cxn: sqlalchemy connection
+    :param keys: column names
+    :param data_iter: iterable of the rows to insert
+    """
+    # None is written as an empty field which COPY reads as NULL
+    buffer = StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+
+    columns = ', '.join(f'"{key}"' for key in keys)
+    table_name = f'{table.schema}.{table.name}' if table.schema else table.name
+    with cxn.connection.cursor() as cursor:
+        cursor.copy_expert(f'COPY {table_name} ({columns}) FROM STDIN WITH CSV', buffer)
+
+
+def calc_spatial_features(xs: np.ndarray, ys: np.ndarray) -> dict:
+    """
+    calculates all the spatial features in one go on plain arrays so the intermediate results
+    (distance to the middle of the goal, angular size, goal post mask) are shared between them
+    :param xs: x coordinates
+    :param ys: y coordinates
+    :return: dictionary of feature name to an array of the feature
+    """
+    mask_between_goal_posts = (ys >= 45) & (ys <= 55)
+
+    distance_to_mid = calc_distance_to_mid(xs, ys)
+    distance_to_nearest = calc_distance_to_nearest(xs, ys, distance_to_mid)
+    angular_size = calc_angular_size_radians(xs, ys)
+    projected_size = calc_projected_size_yds(angular_size, distance_to_nearest, ys,
+                                             mask_between_goal_posts)
+
+    return {'distance_to_goal_mid': distance_to_mid,
+            'distance_to_goal_nearest': distance_to_nearest,
+            'angular_size_rad_goal': angular_size,
+            'projected_size_yds_goal': projected_size}
+
+
+def calc_distance_to_mid(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
     """
     calculates the distance of an event from the center of the goal. Unfortunately soccer pitches
     are not uniformly sized so some assumptions are made currently that length and width are equal
@@ -134,14 +354,15 @@ def calc_distance_to_mid(xs: pd.Series, ys: pd.Series) -> pd.Series:
     y_dimension = 80  # width of largest international pitch in yards
 
     # the point (100%, 50%) being the center of the goal
-    x_squared = ((xs - 100) * x_dimension / 100) ** 2  # accounting for percentage
-    y_squared = ((ys - 50) * y_dimension / 100) ** 2
-    distance = (x_squared + y_squared) ** (1 / 2)
+    x_yds = (xs - 100) * (x_dimension / 100)  # accounting for percentage
+    y_yds = (ys - 50) * (y_dimension / 100)
+    distance = np.hypot(x_yds, y_yds)
 
     return distance
 
 
-def calc_distance_to_nearest(xs: pd.Series, ys: pd.Series) -> pd.Series:
+def calc_distance_to_nearest(xs: np.ndarray, ys: np.ndarray,
+                             distance_to_mid: np.ndarray = None) -> np.ndarray:
     """
     calculates the distance of an event from the nearest point on the goal line (between the goal
     posts). Unfortunately soccer pitches are not uniformly sized so some assumptions are made
@@ -149,72 +370,66 @@ def calc_distance_to_nearest(xs: pd.Series, ys: pd.Series) -> pd.Series:
     competition.
     :param xs: x coordinates
     :param ys: y coordinates
+    :param distance_to_mid: distances to the center of the goal if already calculated, if not
+                            provided they will be calculated
     :return: distances for each event
     """
-    # a confounding variable is that soccer pitches are not uniformly sized
-    x_dimension = 120  # length of largest international pitch in yards
-    y_dimension = 80  # width of largest international pitch in yards
-
-    y_sym = ys.copy()
-    # the calculation is symetric about the 50% line
-    y_sym[y_sym < 50] = 100 - y_sym[y_sym < 50]
+    # outside the goal posts the distance is the same as the distance to the center of the goal
+    if distance_to_mid is None:
+        distance_to_mid = calc_distance_to_mid(xs, ys)
 
     half_goal_width_in_percent = (8 / 80) / 2
 
-    # the point (100%, 50%) being the center of the goal
-    x_squared = ((xs - 100) * x_dimension / 100) ** 2  # accounting for percentage
-    y_squared = ((ys - 50) * y_dimension / 100) ** 2
-    distance = (x_squared + y_squared) ** (1 / 2)
-
-    mask_between_goal_posts = (y_sym < (50 + half_goal_width_in_percent))
+    # the calculation is symetric about the 50% line
+    mask_between_goal_posts = np.abs(ys - 50) < half_goal_width_in_percent
 
-    distance[mask_between_goal_posts] = 100 - xs[mask_between_goal_posts]
+    distance = np.where(mask_between_goal_posts, 100 - xs, distance_to_mid)
 
     return distance
 
 
-def get_goal_vectors(shots_df: pd.DataFrame) -> pd.DataFrame:
+def get_goal_vectors(xs: np.ndarray, ys: np.ndarray) -> tuple:
     """
     Gets vector components to each goal post
-    :param shots_df: a data frame with the x1 and y1 location as columns
+    :param xs: x coordinates
+    :param ys: y coordinates
     :return: The components of the vectors to each goal post and to the midpoint
              x component,
              y component to 1st goal post
              y component to 2nd goal post
              y component to the middle of the goal
     """
-    goal_vectors = pd.DataFrame()
     goal_width = (8 / 80) * 100  # again soccer is imperial, goals are wide 8 yds
-    goal_vectors['x'] = 100 - shots_df['x1']
-    goal_vectors['y1'] = 50 - shots_df['y1'] + (goal_width / 2)  # over 50%
-    goal_vectors['y2'] = 50 - shots_df['y1'] - (goal_width / 2)  # under 50%
-    goal_vectors['y_mid'] = 50 - shots_df['y1']
+    x = 100 - xs
+    y_mid = 50 - ys
+    y1 = y_mid + (goal_width / 2)  # over 50%
+    y2 = y_mid - (goal_width / 2)  # under 50%
 
-    return goal_vectors
+    return x, y1, y2, y_mid
 
 
-def calc_angular_size_radians(shots_df: pd.DataFrame) -> np.ndarray:
+def calc_angular_size_radians(xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
     """
     calculates the angular size of the goal in radians
-    :param shots_df: data frame of shots taker
+    :param xs: x coordinates
+    :param ys: y coordinates
     :return: an array of the angles
     """
     y_conversion = 80/100  # 80yds/100%
     x_conversion = 120/100 # 120yds/100%
-    y_over_x_conversion = y_conversion / x_conversion
-    goal_vectors = get_goal_vectors(shots_df)
-    theta_1 = np.arctan(goal_vectors['y1'] / goal_vectors['x'] * y_over_x_conversion)
-    theta_2 = np.arctan(goal_vectors['y2'] / goal_vectors['x'] * y_over_x_conversion)
-    # x_component = goal_vectors['x']
-    # y_component_1 = goal_vectors['y1']
-    # y_component_2 = goal_vectors['y2']
-    # theta = calc_theta(x_component, y_component_1, y_component_2)
-    theta = np.abs(theta_1-theta_2)
+    x_component, y_component_1, y_component_2, _ = get_goal_vectors(xs, ys)
+    # the components need to be in yards so the angle is not skewed by the pitch proportions
+    # (not scaled in place, integer coordinates give integer components)
+    x_component = x_component * x_conversion
+    y_component_1 = y_component_1 * y_conversion
+    y_component_2 = y_component_2 * y_conversion
+    theta = calc_theta(x_component, y_component_1, y_component_2)
     return theta
 
 
-def calc_projected_size_yds(angular_size: pd.Series,
-                            distance_to_nearest: pd.Series, ys: pd.Series) -> np.ndarray:
+def calc_projected_size_yds(angular_size: np.ndarray, distance_to_nearest: np.ndarray,
+                            ys: np.ndarray,
+                            mask_between_goal_posts: np.ndarray = None) -> np.ndarray:
     """
     calculates a projected size of the goal.  This is a projection of the width of the goal in
     yards. The projection is measured along a line passing through the nearest point on the goal
@@ -223,15 +438,21 @@ def calc_projected_size_yds(angular_size: pd.Series,
     :param angular_size: angular size of the goal
     :param distance_to_nearest: distance to the nearest point
     :param ys: y position of the event
+    :param mask_between_goal_posts: mask of the events between the goal posts (45% <= y <= 55%) if
+                                    already calculated, if not provided it will be calculated
     :return: a projection of the goal size
     """
 
     # This will work for all the points outside the rectangle defined by the goal posts
-    projected_size = np.abs(np.tan(angular_size)) * distance_to_nearest
+    # (worked in place on one output array rather than allocating a temporary per operation)
+    projected_size = np.tan(angular_size)
+    np.abs(projected_size, out=projected_size)
+    projected_size *= distance_to_nearest
 
     # Catching all the points between the goal posts
-    mask_ys_between_goal_posts = (ys >= 45) & (ys <= 55)
-    projected_size[mask_ys_between_goal_posts] = 8
+    if mask_between_goal_posts is None:
+        mask_between_goal_posts = (ys >= 45) & (ys <= 55)
+    projected_size[mask_between_goal_posts] = 8
 
     return projected_size
 
@@ -245,9 +466,18 @@ def calc_theta(x_comp, y1_comp, y2_comp) -> np.ndarray:
     :param y2_comp: the second y component
     :return: the angular width of the goal
     """
-    dot_prod = x_comp * (y1_comp + y2_comp)
-    abs_prod = (x_comp ** 2 + y1_comp ** 2) ** .5 * (x_comp ** 2 + y2_comp ** 2) ** .5
-    theta = np.arccos(dot_prod / abs_prod)
+    # arctan2 stays accurate for small angles (where arccos does not) and handles x = 0, using
+    # the cross and dot products of the 2 vectors it only needs to be evaluated once
+    cross = y1_comp - y2_comp
+    cross *= x_comp
+    np.abs(cross, out=cross)
+    dot = x_comp * x_comp
+    dot += y1_comp * y2_comp
+    # exactly on a post both products are 0 and arctan2 would give 0, keep the pi/2 the
+    # difference of the angles to each post gives there
+    at_post = (cross == 0) & (dot == 0)
+    theta = np.arctan2(cross, dot)
+    theta[at_post] = np.pi / 2
 
     return theta
 
@@ -261,58 +491,84 @@ def get_kicked(shots_df: pd.DataFrame) -> pd.Series:
     return (shots_df['401'] | shots_df['402']) * 1  # TAG: numbers
 
 
-def compare_foot_to_side_of_field(shots_df: pd.DataFrame) -> pd.Series:
+def compare_foot_to_side_of_field(shots_df: pd.DataFrame, mask_right: np.ndarray = None,
+                                  mask_left: np.ndarray = None) -> pd.Series:
     """
     Compares the foot used to the side of the field from which the shot is taken
     -1 means a mismatch, 1 means a match, and 0 means the shot was taken from the middle or the
     field (± 2% ~ half the width of the goal) or the shot was take with the head/body
     :param shots_df: data frame of shots
+    :param mask_right: mask of the shots from the right side (y > 52%) if already calculated
+    :param mask_left: mask of the shots from the left side (y < 48%) if already calculated
     :return: -1 means a mismatch, 1 means a match, and 0 means the shot was taken from the middle
              of the field (± 2% ~ half the width of the goal) or the shot was take with the
              head/body
     """
-    right_matches = ((shots_df['y1'] > 52) & (shots_df['402'])) * 1  # right   # TAG: numbers
-    left_matches = ((shots_df['y1'] < 48) & (shots_df['401'])) * 1  # left   # TAG: numbers
-    right_does_not_match = ((shots_df['y1'] > 52) & (shots_df['401'])) * -1
-    left_does_not_match = ((shots_df['y1'] < 48) & (shots_df['402'])) * -1  # left   # TAG: numbers
+    if mask_right is None:
+        mask_right = shots_df['y1'].to_numpy() > 52
+    if mask_left is None:
+        mask_left = shots_df['y1'].to_numpy() < 48
+
+    # +1 right side, -1 left side, times +1 right foot, -1 left foot
+    side = mask_right.astype(np.int8) - mask_left.astype(np.int8)
+    foot = shots_df['402'].to_numpy(np.int8) - shots_df['401'].to_numpy(np.int8)  # TAG: numbers
 
-    aggregated = right_matches + left_matches + right_does_not_match + left_does_not_match
-    return aggregated
+    return pd.Series(side * foot, index=shots_df.index)
 
 
-def get_send_off_diff(shots_df: pd.DataFrame, engine: sqlalchemy.engine.Engine) -> pd.Series:
+def get_send_off_diff(shots_df: pd.DataFrame, cxn: sqlalchemy.engine.Connection,
+                      leagues: np.ndarray = None) -> pd.Series:
     """
     Returns the player advantage based on the red cards given
     :param shots_df: data frame of shots taken
-    :param engine: sqlalchemy engine
+    :param cxn: sqlalchemy connection
+    :param leagues: leagues to query, if not provided the leagues in shots_df will be used
     :return: the player differential at the time of each shot
     """
-    diffs = pd.Series(data=0, index=shots_df.index)
-    reds = []
-    with engine.connect() as cxn:
-        for league in shots_df['league'].unique():  # this is only 7 leagues
-            query = """SELECT * 
-                       FROM events_{} 
-                       WHERE 
-                        "1701" = True or 
-                        "1703" = True;""".format(league)  # TAG: numbers
-            reds.append(pd.read_sql(query, cxn))
-
-    reds_df = pd.concat(reds)
-    for match in reds_df['matchId'].unique():  # 305 matches with red cards
-        for ind, row in shots_df[shots_df['matchId'] == match].iterrows():  # 50 max
-            same_team_slice = reds_df[(reds_df['eventSec'] < row['eventSec']) &
-                                      (reds_df['teamId'] == row['teamId'])]
-            other_team_slice = reds_df[(reds_df['eventSec'] < row['eventSec']) &
-                                       (reds_df['teamId'] != row['teamId'])]
-            reds_same = len(same_team_slice[same_team_slice['matchId'] == match])
-            reds_other = len(other_team_slice[other_team_slice['matchId'] == match])
-            diffs[ind] = reds_other - reds_same
+    # running count of red cards in the match and against each team, peers at the same eventSec
+    # are counted together by the default window frame
+    query = """SELECT "matchId", "teamId", "eventSec",
+                      COUNT(*) OVER 
+                        (PARTITION BY "matchId" ORDER BY "eventSec") AS "reds_match",
+                      COUNT(*) OVER 
+                        (PARTITION BY "matchId", "teamId" ORDER BY "eventSec") AS "reds_same"
+               FROM events_{} 
+               WHERE 
+                "1701" = True or 
+                "1703" = True"""  # TAG: numbers
+    if leagues is None:
+        leagues = shots_df['league'].unique()
+    reds_query = '\nUNION ALL\n'.join(query.format(league) for league in leagues)  # only 7 leagues
+    reds_df = pd.read_sql(reds_query + '\nORDER BY "eventSec"', cxn)
+
+    # without any red cards the columns come back untyped and there is nothing to merge
+    if reds_df.empty:
+        return pd.Series(data=0, index=shots_df.index)
+
+    shots = shots_df[['matchId', 'teamId', 'eventSec']].reset_index(drop=True)
+    shots['position'] = np.arange(len(shots))
+    shots = shots.sort_values('eventSec', kind='stable')
+    # merge_asof needs the same dtypes for the by keys on both sides, the shots may be downcast
+    reds_df = reds_df.astype(shots.dtypes[['matchId', 'teamId']].to_dict())
+
+    # only red cards strictly before the shot count
+    shots = pd.merge_asof(shots, reds_df[['matchId', 'eventSec', 'reds_match']],
+                          on='eventSec', by='matchId', allow_exact_matches=False)
+    shots = pd.merge_asof(shots, reds_df[['matchId', 'teamId', 'eventSec', 'reds_same']],
+                          on='eventSec', by=['matchId', 'teamId'], allow_exact_matches=False)
+    shots = shots.fillna({'reds_match': 0, 'reds_same': 0})
+
+    reds_same = shots['reds_same'].to_numpy(int)
+    reds_other = shots['reds_match'].to_numpy(int) - reds_same
+    # scatter the differences back to the original positions instead of sorting the frame again
+    send_off_diff = np.empty(len(shots), dtype=int)
+    send_off_diff[shots['position'].to_numpy()] = reds_other - reds_same
+    diffs = pd.Series(data=send_off_diff, index=shots_df.index)
 
     return diffs
 
 
-def get_dominant_foot(shots_df: pd.DataFrame, engine: sqlalchemy.engine.Engine) -> pd.Series:
+def get_dominant_foot(shots_df: pd.DataFrame, cxn: sqlalchemy.engine.Connection) -> pd.Series:
     """
     Cross-references the player database to see if the shot was taken with the player's dominant
     foot. The values mapped are as follows:
@@ -321,7 +577,7 @@ def get_dominant_foot(shots_df: pd.DataFrame, engine: sqlalchemy.engine.Engine)
         +1 for  dominant foot kick
 
     :param shots_df: data frame of shots taken
-    :param engine: sqlalchemy engine
+    :param cxn: sqlalchemy connection
     :return: series for the shots taken of:
 
     """
@@ -329,43 +585,49 @@ def get_dominant_foot(shots_df: pd.DataFrame, engine: sqlalchemy.engine.Engine)
     query = """SELECT "wyId", "foot" 
                FROM players;"""
 
-    with engine.connect() as cxn:
-        player_foot = pd.read_sql(query, cxn)
+    player_foot = pd.read_sql(query, cxn)
 
-    player_foot_dict = pd.Series(player_foot['foot'], index=player_foot['wyId']).to_dict()
+    # the ids are small positive integers so a lookup table indexed by id replaces the dict,
+    # the feet are stored as bit flags: 1 left, 2 right, 3 both, 0 unknown
+    foot_codes = player_foot['foot'].map({'left': 1, 'right': 2, 'both': 3}).fillna(0)
+    player_ids = shots_df['playerId'].to_numpy()
+    foot_lut = np.zeros(max(player_foot['wyId'].max(), player_ids.max()) + 1, dtype=np.int8)
+    foot_lut[player_foot['wyId'].to_numpy()] = foot_codes.to_numpy(np.int8)
+    shot_feet = foot_lut[player_ids]
+    left_ok = (shot_feet & 1).astype(bool)
+    right_ok = (shot_feet & 2).astype(bool)
 
-    def foot_mapping_func(row) -> int:
-        """
-        mapping function because it was too confusing to use lambda
-        only one (left, right, or head) should trigger so to get the correct range we need weight
-        them appropriately, if none trigger, then not a dominant foot, so it should return -1
-        if head triggers, then it returns to 0
-        if left or right trigger then it returns +1
-        :param row: needs columns: '401', '402', '403', and 'playerId' to be in the row
-        :return: integer representation of whether it is a dominant foot
-        """
-        left = row['401'] & (player_foot_dict.get(row['playerId'], 0) in ['left', 'both'])
-        right = row['402'] & (player_foot_dict.get(row['playerId'], 0) in ['right', 'both'])
-        head = row['403']  # TAG: numbers
+    # only one (left, right, or head) should trigger so to get the correct range we need to weight
+    # them appropriately, if none trigger, then not a dominant foot, so it should return -1
+    # if head triggers, then it returns to 0
+    # if left or right trigger then it returns +1
+    left = shots_df['401'].to_numpy(bool) & left_ok
+    right = shots_df['402'].to_numpy(bool) & right_ok
+    head = shots_df['403'].to_numpy(bool)  # TAG: numbers
 
-        return (2 * left) + (2 * right) + (1 * head) - 1
+    dominant = (2 * left.astype(np.int8)) + (2 * right.astype(np.int8)) + \
+               (1 * head.astype(np.int8)) - 1
 
-    return shots_df.apply(foot_mapping_func, axis=1)
+    return pd.Series(dominant, index=shots_df.index)
 
 
-def get_free_kick_data(shots_df, engine) -> pd.Series:
+def get_free_kick_data(shots_df: pd.DataFrame, cxn: sqlalchemy.engine.Connection,
+                       leagues: np.ndarray = None) -> pd.Series:
     """
     gets free kick data from the last 30 sec
     :param shots_df: data frame of shots taken
-    :param engine: sqlalchemy engine
+    :param cxn: sqlalchemy connection
+    :param leagues: leagues to query, if not provided the leagues in shots_df will be used
     :return: a series of "subEventName" of free kicks that happen within 30 seconds of a shot
     """
+    # Filter in the outer query:
+    #   - less than 30 sec ago
+    #   - previous event is not a shot aka its a free kick
+    #   - make sure its the same team
     query = """ SELECT
                     response."matchId", 
                     response."eventSec",
-                    response."time_to_last_event",
-                    response."previous_event",
-                    response."previous_team"
+                    response."previous_event"
                 FROM (
                     SELECT "eventName", "matchId", "eventSec",
                         LAG("subEventName", 1) OVER 
@@ -380,31 +642,25 @@ def get_free_kick_data(shots_df, engine) -> pd.Series:
                             "eventName" = 'Free Kick'
                     ) AS response
                 WHERE 
-                      "eventName" = 'Shot';"""
-    shots_prev_event_list = []
-    with engine.connect() as cxn:
-        for league in shots_df['league'].unique():
-            shots_prev_event_list.append(pd.read_sql(query.format(league), cxn))
+                      "eventName" = 'Shot' AND
+                      "teamId" = "previous_team" AND
+                      "previous_event" <> 'Shot' AND
+                      "time_to_last_event" < 30"""
+    if leagues is None:
+        leagues = shots_df['league'].unique()
+    shots_prev_event_query = '\nUNION ALL\n'.join(query.format(league) for league in leagues)
+    shots_prev_event_df = pd.read_sql(shots_prev_event_query, cxn)
 
-    shots_prev_event_df = pd.concat(shots_prev_event_list)
-
-    # Merging to make sure the indices align
-    merge_on = ['matchId', 'eventSec']
-    shots_merged = pd.merge(shots_df, shots_prev_event_df, how='left', on=merge_on)
-
-    # Mask:
-    #   - less than 30 sec ago
-    #   - previous event is not a shot aka its a free kick
-    #   - make sure its the same team
-    mask = (shots_merged['time_to_last_event'] < 30) & \
-           (shots_merged['previous_event'] != 'Shot') & \
-           (shots_merged['previous_team'] == shots_merged['teamId'])
+    # Joining on the index to make sure the indices align, shots without a free kick are left empty
+    join_on = ['matchId', 'eventSec']
+    shots_prev_event_df = shots_prev_event_df.set_index(join_on)
+    shots_merged = shots_df[join_on].join(shots_prev_event_df, on=join_on, how='left')
 
-    return mask * shots_merged['previous_event']
+    return shots_merged['previous_event'].fillna('')
 
 
 if __name__ == '__main__':
-    df = get_data()
+    df = get_cached_data()
     print(df[['projected_size_yds_goal']].describe())
     print(df.head())
     print(df.columns)
@@ -1,19 +1,29 @@
-import json
+"""
+Loads the data/events/events_<league>.json files into events_<league> tables. Run it as a script
+from any folder (python load_events_db.py) or as a module from the repository root
+(python -m scripts.load_events_db)
+"""
+import os
 from warnings import warn
 
-import yaml
-import sqlalchemy
+import ijson
 import pandas as pd
 
-with open('../keys/sql_cred.yml') as file_stream:
-    sql_dict = yaml.safe_load(file_stream)
+try:
+    from .data_retrieval import get_engine, get_table_names, psql_insert_copy
+except ImportError:  # run as a script, scripts/ is on the path
+    from data_retrieval import get_engine, get_table_names, psql_insert_copy
+
+# the data folder is found relative to this file so the script can be run from any folder
+data_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
 
 # Establish connection with soccer_data and get tables
-engine = sqlalchemy.create_engine(sql_dict['sql_url'])
-tables = engine.table_names()
+engine = get_engine()
+tables = get_table_names(engine)
 
 leagues = ['England', 'France', 'Germany', 'Italy', 'Spain', 'European_Championship', 'World_Cup']
-file_path_generic = '../data/events/events_{}.json'
+file_path_generic = os.path.join(data_folder, 'events', 'events_{}.json')
 leagues_to_load = list(leagues)
 table_template = 'events_{}'
 
@@ -30,47 +40,45 @@ for league in leagues_to_load:
 for league in leagues_to_load:  # this is only 7 league long
     league_data_fp = file_path_generic.format(league)
     print(f'opening file for: {league}')
-    with open(league_data_fp) as f_stream:
-        events = json.load(f_stream)
-    print('json loaded')
-    print(f'{len(events)} events found\n')
-
+    events = []
     print('Starting flattening process:')
-    for event in events:
-        print(f'Working on event: {event["id"]}')
-        print(f'\t{event["eventName"]}')
-        # parse positional data
-        y1 = event['positions'][0]['y']
-        x1 = event['positions'][0]['x']
-        try:
-            y2 = event['positions'][1]['y']
-        except IndexError:
-            x2 = y2 = None
-            warn('No second position! setting values to None')
-        else:
-            x2 = event['positions'][1]['x']
-        event['y1'] = y1
-        event['x1'] = x1
-        event['y2'] = y2
-        event['x2'] = x2
+    # stream the events one at a time so the whole json file never has to be held in memory
+    with open(league_data_fp, 'rb') as f_stream:
+        for event in ijson.items(f_stream, 'item', use_float=True):
+            print(f'Working on event: {event["id"]}')
+            print(f'\t{event["eventName"]}')
+            # pop the nested data so the the columns aren't there for the construction of the
+            # dataframe
+            positions = event.pop('positions')
+            tags = event.pop('tags')
+
+            # parse positional data
+            event['y1'] = positions[0]['y']
+            event['x1'] = positions[0]['x']
+            if len(positions) > 1:
+                event['y2'] = positions[1]['y']
+                event['x2'] = positions[1]['x']
+            else:
+                event['y2'] = event['x2'] = None
+                warn('No second position! setting values to None')
 
-        # parse tags
-        for item in event['tags']:  # max length ~ 6 items
-            event.update({value: True for value in [*item.values()]})
+            # parse tags
+            for item in tags:  # max length ~ 6 items
+                for value in item.values():
+                    event[value] = True
 
-        # remove data so the the columns aren't there for the construction of the dataframe
-        del event['positions']
-        del event['tags']
+            events.append(event)
+    print(f'\n\n{len(events)} events found')
 
     print('\n\nFlattening Complete\n\nCreating DF:')
-    events_df = pd.json_normalize(events)
+    events_df = pd.DataFrame(events)  # events are already flat, no need for json_normalize
     print('DF complete:')
     # print(events_df.head(10))
 
     table_name = table_template.format(league.lower())
     print(f'writing to sql db: {table_name}')
     with engine.connect() as cxn:
-        events_df.to_sql(table_name, cxn, index=False)
+        events_df.to_sql(table_name, cxn, index=False, method=psql_insert_copy, chunksize=50_000)
 
     print(f'table "{table_name}" stored\n\n')
 print('Completed loading the following league data:')
@@ -1,22 +1,32 @@
+"""
+Loads data/players.json into the players table. Run it as a script from any folder
+(python load_player_db.py) or as a module from the repository root
+(python -m scripts.load_player_db)
+"""
+import os
 import json
 
-import yaml
-import sqlalchemy
 import pandas as pd
 
-with open('../keys/sql_cred.yml') as file_stream:
-    sql_dict = yaml.safe_load(file_stream)
+try:
+    from .data_retrieval import get_engine, get_table_names, psql_insert_copy
+except ImportError:  # run as a script, scripts/ is on the path
+    from data_retrieval import get_engine, get_table_names, psql_insert_copy
 
-engine = sqlalchemy.create_engine(sql_dict['sql_url'])
-if 'players' in engine.table_names():
+# the data folder is found relative to this file so the script can be run from any folder
+data_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+
+engine = get_engine()
+if 'players' in get_table_names(engine):
     print('Data already loaded')
 else:
 
-    with open('../data/players.json') as f_stream:
+    with open(os.path.join(data_folder, 'players.json')) as f_stream:
         players = json.load(f_stream)
 
+    # the players have nested areas and roles so they still need to be normalized
     players_df = pd.json_normalize(players)
 
     with engine.connect() as cxn:
-        players_df.to_sql('players', cxn, index=False)
+        players_df.to_sql('players', cxn, index=False, method=psql_insert_copy)
 
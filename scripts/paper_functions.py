@@ -3,63 +3,98 @@ These functions were taken from the jupyter notebook from the paper where the da
 https://figshare.com/articles/software/Plots_replication_code_of_Nature_Scientific_Data_paper/11473365
 
 """
-import matplotlib.pyplot as plt
-from matplotlib.patches import Ellipse
+from functools import lru_cache
+
+import numpy as np
+
+# matplotlib is imported inside the functions so importing this module doesn't pay for pyplot
+# unless a pitch is actually drawn
+
+# The markings never change so they are built once, pitch() is in percentages and draw_pitch() is
+# in meters (104 x 68) with the pitch horizontal, the vertical pitch has x and y swapped.
+# pitch() has each line separate, as in the original plots, so the corners are the overlapping
+# caps of two lines
+_PITCH_MARKINGS = [np.array(segment) for segment in [
+    [(0, 0), (0, 100)], [(0, 100), (100, 100)], [(100, 100), (100, 0)],  # Pitch Outline
+    [(100, 0), (0, 0)],
+    [(50, 0), (50, 100)],  # Centre Line
+    [(16.5, 80), (16.5, 20)], [(0, 80), (16.5, 80)], [(16.5, 20), (0, 20)],  # Left Penalty Area
+    [(83.5, 80), (100, 80)], [(83.5, 80), (83.5, 20)], [(83.5, 20), (100, 20)],  # Right Penalty
+    [(0, 65), (5.5, 65)], [(5.5, 65), (5.5, 35)], [(5.5, 35), (0.5, 35)],  # Left 6-yard Box
+    [(100, 65), (94.5, 65)], [(94.5, 65), (94.5, 35)], [(94.5, 35), (100, 35)]]]  # Right 6-yard
+
+_MARKINGS_H = [np.array([(0, 0), (104, 0), (104, 68), (0, 68), (0, 0)]),  # side and goal lines
+               np.array([(104, 13.84), (87.5, 13.84), (87.5, 54.16), (104, 54.16)]),  # outer boxes
+               np.array([(0, 13.84), (16.5, 13.84), (16.5, 54.16), (0, 54.16)]),
+               np.array([(104, 30.34), (104.2, 30.34), (104.2, 37.66), (104, 37.66)]),  # goals
+               np.array([(0, 30.34), (-0.2, 30.34), (-0.2, 37.66), (0, 37.66)]),
+               np.array([(104, 24.84), (99.5, 24.84), (99.5, 43.16), (104, 43.16)]),  # 6 yd boxes
+               np.array([(0, 24.84), (4.5, 24.84), (4.5, 43.16), (0, 43.16)]),
+               np.array([(52, 0), (52, 68)])]  # Halfway line
+_MARKINGS_V = [marking[:, ::-1] for marking in _MARKINGS_H]
+
+# penalty spots and kickoff spot
+_SPOTS_H = np.array([(93, 34), (11, 34), (52, 34)])
+_SPOTS_V = _SPOTS_H[:, ::-1]
+
+# penalty arcs and centre circle
+_CIRCLES_H = np.array([(93.5, 34), (10.5, 34), (52, 34)])
+_CIRCLES_V = _CIRCLES_H[:, ::-1]
+
+# (corner, width, height) of the pitch rectangle and the rectangles in the boxes
+_RECTANGLES_H = [((-1, -1), 106, 70), ((87.5, 20), 16, 30), ((0, 20), 16.5, 30)]
+_RECTANGLES_V = [((-1, -1), 70, 106), ((20, 87.5), 30, 16.5), ((20, 0), 30, 16.5)]
+
+_MARKINGS = {'pitch': _PITCH_MARKINGS, 'horizontal': _MARKINGS_H, 'vertical': _MARKINGS_V}
+
+
+@lru_cache(maxsize=None)
+def _markings_path(markings_key):
+    """
+    joins the marking polylines into a single compound path so they are drawn by one patch, the
+    path is read only so it is built once and shared by every figure
+    :param markings_key: which markings to join: 'pitch', 'horizontal' or 'vertical'
+    """
+    from matplotlib.path import Path
+
+    markings = _MARKINGS[markings_key]
+    vertices = np.concatenate(markings)
+    codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+    # every marking starts by moving to its first vertex
+    starts = np.cumsum([0] + [len(marking) for marking in markings[:-1]])
+    codes[starts] = Path.MOVETO
+
+    return Path(vertices, codes, readonly=True)
 
 
 def pitch():
     """
     code to plot a soccer pitch
     """
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Ellipse, PathPatch
+
     # create figure
     fig, ax = plt.subplots(figsize=(7, 5))
 
-    # Pitch Outline & Centre Line
-    plt.plot([0, 0], [0, 100], color="black")
-    plt.plot([0, 100], [100, 100], color="black")
-    plt.plot([100, 100], [100, 0], color="black")
-    plt.plot([100, 0], [0, 0], color="black")
-    plt.plot([50, 50], [0, 100], color="black")
-
-    # Left Penalty Area
-    plt.plot([16.5, 16.5], [80, 20], color="black")
-    plt.plot([0, 16.5], [80, 80], color="black")
-    plt.plot([16.5, 0], [20, 20], color="black")
-
-    # Right Penalty Area
-    plt.plot([83.5, 100], [80, 80], color="black")
-    plt.plot([83.5, 83.5], [80, 20], color="black")
-    plt.plot([83.5, 100], [20, 20], color="black")
-
-    # Left 6-yard Box
-    plt.plot([0, 5.5], [65, 65], color="black")
-    plt.plot([5.5, 5.5], [65, 35], color="black")
-    plt.plot([5.5, 0.5], [35, 35], color="black")
-
-    # Right 6-yard Box
-    plt.plot([100, 94.5], [65, 65], color="black")
-    plt.plot([94.5, 94.5], [65, 35], color="black")
-    plt.plot([94.5, 100], [35, 35], color="black")
+    # limit axis, the limits are fixed so the patches are added with add_artist which skips
+    # updating the data limits
+    ax.set_xlim(0, 100)
+    ax.set_ylim(0, 100)
+
+    # The markings are drawn as one path, with the caps and joins of plot() lines
+    ax.add_artist(PathPatch(_markings_path('pitch'), edgecolor="black", facecolor="none",
+                            lw=1.5, capstyle='projecting', joinstyle='round'))
 
     # Prepare Circles
     centreCircle = Ellipse((50, 50), width=30, height=39, edgecolor="black", facecolor="None",
                            lw=1.8)
-    centreSpot = Ellipse((50, 50), width=1, height=1.5, edgecolor="black", facecolor="black",
-                         lw=1.8)
-    leftPenSpot = Ellipse((11, 50), width=1, height=1.5, edgecolor="black", facecolor="black",
-                          lw=1.8)
-    rightPenSpot = Ellipse((89, 50), width=1, height=1.5, edgecolor="black", facecolor="black",
-                           lw=1.8)
 
     # Draw Circles
-    ax.add_patch(centreCircle)
-    ax.add_patch(centreSpot)
-    ax.add_patch(leftPenSpot)
-    ax.add_patch(rightPenSpot)
+    ax.add_artist(centreCircle)
 
-    # limit axis
-    plt.xlim(0, 100)
-    plt.ylim(0, 100)
+    # centre and penalty spots
+    ax.scatter([50, 11, 89], [50, 50, 50], s=16, c="black", lw=1.8, zorder=5)
 
     ax.annotate("", xy=(25, 5), xytext=(5, 5),
                 arrowprops=dict(arrowstyle="->", linewidth=2))
@@ -75,161 +110,65 @@ def draw_pitch(pitch, line, orientation, view):
     ----------
     pitch
 
+    Returns
+    -------
+    fig, ax of the pitch
     """
-    orientation = orientation
-    view = view
-    line = line
-    pitch = pitch
+    import matplotlib.pyplot as plt
+    from matplotlib.patches import Rectangle, PathPatch
+    from matplotlib.collections import EllipseCollection
 
-    if orientation.lower().startswith("h"):
+    if orientation[:1] in ("h", "H"):
 
-        if view.lower().startswith("h"):
+        if view[:1] in ("h", "H"):
             fig, ax = plt.subplots(figsize=(6.8, 10.4))
-            plt.xlim(49, 105)
-            plt.ylim(-1, 69)
+            ax.set_xlim(49, 105)
+            ax.set_ylim(-1, 69)
         else:
             fig, ax = plt.subplots(figsize=(10.4, 6.8))
-            plt.xlim(-1, 105)
-            plt.ylim(-1, 69)
-        ax.axis('off')  # this hides the x and y ticks
-
-        # side and goal lines #
-        ly1 = [0, 0, 68, 68, 0]
-        lx1 = [0, 104, 104, 0, 0]
-
-        plt.plot(lx1, ly1, color=line, zorder=5)
-
-        # boxes, 6 yard box and goals
-
-        # outer boxes#
-        ly2 = [13.84, 13.84, 54.16, 54.16]
-        lx2 = [104, 87.5, 87.5, 104]
-        plt.plot(lx2, ly2, color=line, zorder=5)
-
-        ly3 = [13.84, 13.84, 54.16, 54.16]
-        lx3 = [0, 16.5, 16.5, 0]
-        plt.plot(lx3, ly3, color=line, zorder=5)
-
-        # goals#
-        ly4 = [30.34, 30.34, 37.66, 37.66]
-        lx4 = [104, 104.2, 104.2, 104]
-        plt.plot(lx4, ly4, color=line, zorder=5)
-
-        ly5 = [30.34, 30.34, 37.66, 37.66]
-        lx5 = [0, -0.2, -0.2, 0]
-        plt.plot(lx5, ly5, color=line, zorder=5)
-
-        # 6 yard boxes#
-        ly6 = [24.84, 24.84, 43.16, 43.16]
-        lx6 = [104, 99.5, 99.5, 104]
-        plt.plot(lx6, ly6, color=line, zorder=5)
-
-        ly7 = [24.84, 24.84, 43.16, 43.16]
-        lx7 = [0, 4.5, 4.5, 0]
-        plt.plot(lx7, ly7, color=line, zorder=5)
-
-        # Halfway line, penalty spots, and kickoff spot
-        ly8 = [0, 68]
-        lx8 = [52, 52]
-        plt.plot(lx8, ly8, color=line, zorder=5)
-
-        plt.scatter(93, 34, color=line, zorder=5)
-        plt.scatter(11, 34, color=line, zorder=5)
-        plt.scatter(52, 34, color=line, zorder=5)
-
-        circle1 = plt.Circle((93.5, 34), 9.15, ls='solid', lw=1.5, color=line, fill=False, zorder=1,
-                             alpha=1)
-        circle2 = plt.Circle((10.5, 34), 9.15, ls='solid', lw=1.5, color=line, fill=False, zorder=1,
-                             alpha=1)
-        circle3 = plt.Circle((52, 34), 9.15, ls='solid', lw=1.5, color=line, fill=False, zorder=2,
-                             alpha=1)
-
-        ## Rectangles in boxes
-        rec1 = plt.Rectangle((87.5, 20), 16, 30, ls='-', color=pitch, zorder=1, alpha=1)
-        rec2 = plt.Rectangle((0, 20), 16.5, 30, ls='-', color=pitch, zorder=1, alpha=1)
-
-        ## Pitch rectangle
-        rec3 = plt.Rectangle((-1, -1), 106, 70, ls='-', color=pitch, zorder=1, alpha=1)
-
-        ax.add_artist(rec3)
-        ax.add_artist(circle1)
-        ax.add_artist(circle2)
-        ax.add_artist(rec1)
-        ax.add_artist(rec2)
-        ax.add_artist(circle3)
+            ax.set_xlim(-1, 105)
+            ax.set_ylim(-1, 69)
+        markings, spots, circle_centres, rectangles = \
+            'horizontal', _SPOTS_H, _CIRCLES_H, _RECTANGLES_H
 
     else:
-        if view.lower().startswith("h"):
+        if view[:1] in ("h", "H"):
             fig, ax = plt.subplots(figsize=(10.4, 6.8))
-            plt.ylim(49, 105)
-            plt.xlim(-1, 69)
+            ax.set_ylim(49, 105)
+            ax.set_xlim(-1, 69)
         else:
             fig, ax = plt.subplots(figsize=(6.8, 10.4))
-            plt.ylim(-1, 105)
-            plt.xlim(-1, 69)
-        ax.axis('off')  # this hides the x and y ticks
-
-        # side and goal lines #
-        lx1 = [0, 0, 68, 68, 0]
-        ly1 = [0, 104, 104, 0, 0]
-
-        plt.plot(lx1, ly1, color=line, zorder=5)
-
-        # boxes, 6 yard box and goals
-
-        # outer boxes#
-        lx2 = [13.84, 13.84, 54.16, 54.16]
-        ly2 = [104, 87.5, 87.5, 104]
-        plt.plot(lx2, ly2, color=line, zorder=5)
-
-        lx3 = [13.84, 13.84, 54.16, 54.16]
-        ly3 = [0, 16.5, 16.5, 0]
-        plt.plot(lx3, ly3, color=line, zorder=5)
-
-        # goals#
-        lx4 = [30.34, 30.34, 37.66, 37.66]
-        ly4 = [104, 104.2, 104.2, 104]
-        plt.plot(lx4, ly4, color=line, zorder=5)
-
-        lx5 = [30.34, 30.34, 37.66, 37.66]
-        ly5 = [0, -0.2, -0.2, 0]
-        plt.plot(lx5, ly5, color=line, zorder=5)
-
-        # 6 yard boxes#
-        lx6 = [24.84, 24.84, 43.16, 43.16]
-        ly6 = [104, 99.5, 99.5, 104]
-        plt.plot(lx6, ly6, color=line, zorder=5)
-
-        lx7 = [24.84, 24.84, 43.16, 43.16]
-        ly7 = [0, 4.5, 4.5, 0]
-        plt.plot(lx7, ly7, color=line, zorder=5)
-
-        # Halfway line, penalty spots, and kickoff spot
-        lx8 = [0, 68]
-        ly8 = [52, 52]
-        plt.plot(lx8, ly8, color=line, zorder=5)
-
-        plt.scatter(34, 93, color=line, zorder=5)
-        plt.scatter(34, 11, color=line, zorder=5)
-        plt.scatter(34, 52, color=line, zorder=5)
-
-        circle1 = plt.Circle((34, 93.5), 9.15, ls='solid', lw=1.5, color=line, fill=False, zorder=1,
-                             alpha=1)
-        circle2 = plt.Circle((34, 10.5), 9.15, ls='solid', lw=1.5, color=line, fill=False, zorder=1,
-                             alpha=1)
-        circle3 = plt.Circle((34, 52), 9.15, ls='solid', lw=1.5, color=line, fill=False, zorder=2,
-                             alpha=1)
-
-        ## Rectangles in boxes
-        rec1 = plt.Rectangle((20, 87.5), 30, 16.5, ls='-', color=pitch, zorder=1, alpha=1)
-        rec2 = plt.Rectangle((20, 0), 30, 16.5, ls='-', color=pitch, zorder=1, alpha=1)
-
-        ## Pitch rectangle
-        rec3 = plt.Rectangle((-1, -1), 70, 106, ls='-', color=pitch, zorder=1, alpha=1)
-
-        ax.add_artist(rec3)
-        ax.add_artist(circle1)
-        ax.add_artist(circle2)
-        ax.add_artist(rec1)
-        ax.add_artist(rec2)
-        ax.add_artist(circle3)
+            ax.set_ylim(-1, 105)
+            ax.set_xlim(-1, 69)
+        markings, spots, circle_centres, rectangles = \
+            'vertical', _SPOTS_V, _CIRCLES_V, _RECTANGLES_V
+    ax.axis('off')  # this hides the x and y ticks
+
+    # the limits are fixed so nothing needs to update the data limits, the artists are added with
+    # add_artist and the collection with autolim off
+
+    # side and goal lines, boxes, goals, 6 yard boxes and the halfway line are drawn as one path
+    # the caps and joins of the plot() lines the markings used to be drawn with
+    ax.add_artist(PathPatch(_markings_path(markings), edgecolor=line, facecolor='none', lw=1.5,
+                            capstyle='projecting', joinstyle='round', zorder=5))
+
+    # penalty spots, and kickoff spot
+    ax.scatter(spots[:, 0], spots[:, 1], color=line, zorder=5)
+
+    # the penalty arcs and centre circle share one collection, sized in data units so they
+    # scale with the pitch
+    circles = EllipseCollection(18.3, 18.3, 0, units='xy', offsets=circle_centres,
+                                offset_transform=ax.transData, facecolors='none',
+                                edgecolors=line, linewidths=1.5, zorder=1)
+
+    ## Pitch rectangle and rectangles in boxes
+    rec3, rec1, rec2 = (Rectangle(corner, width, height, ls='-', color=pitch, zorder=1, alpha=1)
+                        for corner, width, height in rectangles)
+
+    # the box rectangles cover the part of the penalty circles inside the boxes
+    ax.add_artist(rec3)
+    ax.add_collection(circles, autolim=False)
+    ax.add_artist(rec1)
+    ax.add_artist(rec2)
+
+    return fig, ax
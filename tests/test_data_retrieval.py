@@ -0,0 +1,224 @@
+import os
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import sqlalchemy
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+
+import data_retrieval  # noqa: E402
+from data_retrieval import (assemble_df, calc_angular_size_radians,  # noqa: E402
+                            get_dominant_foot, get_free_kick_data, get_send_off_diff)
+
+
+def sqlite_table_columns(engine) -> dict:
+    """
+    stands in for get_table_columns, sqlite has no information_schema
+    """
+    tables = pd.read_sql("SELECT name FROM sqlite_master WHERE type = 'table' AND "
+                         "name LIKE 'events_%'", engine)['name']
+    table_columns = {}
+    for table in sorted(tables):
+        info = pd.read_sql(f'PRAGMA table_info({table})', engine)
+        table_columns[table] = dict(zip(info['name'], info['type']))
+
+    return table_columns
+
+
+class TestAssembleDf(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine('sqlite://')
+        # the tags are only stored when True so each league has its own set of tag columns
+        pd.DataFrame({'id': [1, 2], 'eventName': ['Shot', 'Pass'], 'x1': [90, 50],
+                      '101': [True, None], '401': [None, True]}  # TAG: numbers
+                     ).to_sql('events_england', self.engine, index=False)
+        pd.DataFrame({'id': [3, 4], 'eventName': ['Shot', 'Shot'], 'subEventName': ['a', 'b'],
+                      '402': [True, None]}  # TAG: numbers
+                     ).to_sql('events_spain', self.engine, index=False)
+        patch = mock.patch.object(data_retrieval, 'get_table_columns', sqlite_table_columns)
+        patch.start()
+        self.addCleanup(patch.stop)
+
+    def test_union_of_tables(self):
+        columns = ['id', 'subEventName', 'x1', '101', '401', '402', '403']  # TAG: numbers
+        data_df = assemble_df(self.engine, columns=columns)
+
+        self.assertEqual(list(data_df.columns), columns + ['league'])
+        # only the shots, labelled with the league from the table name
+        self.assertEqual(data_df['id'].tolist(), [1, 3, 4])
+        self.assertEqual(data_df['league'].tolist(), ['england', 'spain', 'spain'])
+
+        # the tags are booleans, NULL and tags a table doesn't have are False
+        for tag in ['101', '401', '402', '403']:  # TAG: numbers
+            self.assertEqual(data_df[tag].dtype, bool)
+        self.assertEqual(data_df['101'].tolist(), [True, False, False])
+        self.assertEqual(data_df['402'].tolist(), [False, True, False])
+        self.assertFalse(data_df['403'].any())
+
+        # other columns a table doesn't have are NULL
+        self.assertTrue(pd.isna(data_df['subEventName'].iloc[0]))
+        self.assertEqual(data_df['subEventName'].iloc[1:].tolist(), ['a', 'b'])
+        self.assertEqual(data_df['x1'].iloc[0], 90)
+        self.assertTrue(data_df['x1'].iloc[1:].isna().all())
+
+    def test_missing_column(self):
+        with self.assertRaisesRegex(ValueError, r"\['playerId'\].*events_england.*events_spain"):
+            assemble_df(self.engine, columns=['id', 'playerId', '101'])
+
+
+class TestGetSendOffDiff(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine('sqlite://')
+        events = pd.DataFrame({'matchId': [1, 1, 1, 2], 'teamId': [10, 20, 10, 30],
+                               'eventSec': [5.0, 60.0, 120.0, 30.0],
+                               'eventName': ['Shot', 'Foul', 'Shot', 'Shot'],
+                               '1701': [None, None, None, None],
+                               '1703': [None, None, None, None]})  # TAG: numbers
+        events.to_sql('events_england', self.engine, index=False)
+        self.shots = events[events['eventName'] == 'Shot'].assign(league='england')
+
+    def test_no_red_cards(self):
+        with self.engine.connect() as cxn:
+            diffs = get_send_off_diff(self.shots, cxn)
+
+        self.assertEqual(diffs.tolist(), [0, 0, 0])
+        self.assertTrue(diffs.index.equals(self.shots.index))
+
+    def test_red_card_before_shot(self):
+        with self.engine.connect() as cxn:
+            cxn.execute(sqlalchemy.text('UPDATE events_england SET "1701" = 1 '
+                                        'WHERE "eventSec" = 60.0'))
+            diffs = get_send_off_diff(self.shots, cxn)
+
+        # the red card for team 20 at 60s gives team 10 the advantage for its shot at 120s
+        self.assertEqual(diffs.tolist(), [0, 1, 0])
+
+
+
+class TestGetFreeKickData(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine('sqlite://')
+        events = pd.DataFrame(
+            [(1, 10, 10.0, 'Free Kick', 'Free kick cross'),
+             (1, 10, 20.0, 'Pass', 'Simple pass'),  # only shots and free kicks are compared
+             (1, 10, 25.0, 'Shot', 'Shot'),  # same team within 30s
+             (1, 20, 100.0, 'Free Kick', 'Free Kick'),
+             (1, 10, 110.0, 'Shot', 'Shot'),  # other team's free kick
+             (1, 10, 200.0, 'Free Kick', 'Corner'),
+             (1, 10, 230.0, 'Shot', 'Shot'),  # exactly 30s later
+             (1, 10, 300.0, 'Free Kick', 'Corner'),
+             (1, 10, 329.5, 'Shot', 'Shot'),  # just within 30s
+             (1, 10, 335.0, 'Shot', 'Shot'),  # previous event is a shot
+             (2, 30, 5.0, 'Shot', 'Shot')],  # no previous event in the match
+            columns=['matchId', 'teamId', 'eventSec', 'eventName', 'subEventName'])
+        events.to_sql('events_england', self.engine, index=False)
+        self.shots = events[events['eventName'] == 'Shot'].assign(league='england')
+
+    def test_free_kicks_before_shots(self):
+        with self.engine.connect() as cxn:
+            free_kicks = get_free_kick_data(self.shots, cxn)
+
+        self.assertEqual(free_kicks.tolist(), ['Free kick cross', '', '', 'Corner', '', ''])
+        self.assertTrue(free_kicks.index.equals(self.shots.index))
+
+
+class TestGetDominantFoot(unittest.TestCase):
+
+    def setUp(self):
+        self.engine = sqlalchemy.create_engine('sqlite://')
+        # real wyIds are far larger than the number of players
+        players = pd.DataFrame({'wyId': [3476, 217031, 25413, 8480],
+                                'foot': ['left', 'right', 'both', None]})
+        players.to_sql('players', self.engine, index=False)
+
+    def test_dominant_foot(self):
+        shots = pd.DataFrame({'playerId': [3476, 3476, 217031, 25413, 25413, 8480, 99999, 3476],
+                              'body_part': ['left', 'right', 'right', 'left', 'right', 'left',
+                                            'right', 'head']})
+        for tag, body_part in [('401', 'left'), ('402', 'right'), ('403', 'head')]:  # TAG: numbers
+            shots[tag] = shots['body_part'] == body_part
+
+        with self.engine.connect() as cxn:
+            dominant = get_dominant_foot(shots, cxn)
+
+        # left footer: left, right; right footer: right; both: left, right; unknown foot; player
+        # missing from the players table; header
+        self.assertEqual(dominant.tolist(), [1, -1, 1, 1, 1, -1, -1, 0])
+
+
+class TestCalcAngularSizeRadians(unittest.TestCase):
+
+    def test_integer_coordinates(self):
+        # positions are stored as integers in the data base
+        xs = np.array([100, 100, 90, 50, 0, 88])
+        ys = np.array([45, 50, 40, 50, 10, 55])
+
+        angles = calc_angular_size_radians(xs, ys)
+
+        np.testing.assert_allclose(angles, calc_angular_size_radians(xs.astype(float),
+                                                                     ys.astype(float)))
+        # on a post, in the middle of the goal and straight out from the goal
+        np.testing.assert_allclose(angles[:4], [np.pi / 2, np.pi, 0.46364761, 0.13313633])
+
+
+
+class TestGetCachedData(unittest.TestCase):
+
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.temp_dir.name, 'shots_features.pkl')
+        cred_path = os.path.join(self.temp_dir.name, 'sql_cred.yml')
+        open(cred_path, 'w').close()
+        os.utime(cred_path, (0, 0))  # older than any cache written by the tests
+
+        self.versions = ((1, 'events_england', 100, 0, 0),)
+        self.get_data = mock.Mock(side_effect=lambda: pd.DataFrame({'x1': [1.0, 2.0]}))
+        patches = [mock.patch.object(data_retrieval, 'get_engine'),
+                   mock.patch.object(data_retrieval, 'get_sql_cred_location',
+                                     return_value=cred_path),
+                   mock.patch.object(data_retrieval, 'get_table_versions',
+                                     side_effect=lambda engine: self.versions),
+                   mock.patch.object(data_retrieval, 'get_data', self.get_data)]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.temp_dir.cleanup)
+
+    def test_hit(self):
+        first = data_retrieval.get_cached_data(self.cache_path)
+        second = data_retrieval.get_cached_data(self.cache_path)
+
+        self.assertEqual(self.get_data.call_count, 1)
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_miss_after_key_change(self):
+        data_retrieval.get_cached_data(self.cache_path, cache_key='a')
+        data_retrieval.get_cached_data(self.cache_path, cache_key='b')
+        data_retrieval.get_cached_data(self.cache_path, cache_key='b')
+
+        self.assertEqual(self.get_data.call_count, 2)
+
+    def test_miss_after_invalidate(self):
+        data_retrieval.get_cached_data(self.cache_path)
+        data_retrieval.get_cached_data(self.cache_path, invalidate=True)
+
+        self.assertEqual(self.get_data.call_count, 2)
+
+    def test_miss_after_tables_change(self):
+        data_retrieval.get_cached_data(self.cache_path)
+        # another league loaded
+        self.versions = self.versions + ((2, 'events_spain', 100, 0, 0),)
+        data_retrieval.get_cached_data(self.cache_path)
+
+        self.assertEqual(self.get_data.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()